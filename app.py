@@ -1,13 +1,82 @@
-from flask import Flask, render_template, request, jsonify
-import plotly
-import plotly.graph_objs as go
+from flask import Flask, render_template, request, jsonify, abort
+from collections import OrderedDict
+import gzip
+import hashlib
 import json
+import threading
 import numpy as np
 from models.calculator import EnergyStorageCalculator
 from models.financial import FinancialMetrics
+from models.replacement import ReplacementOptimizer
 
 app = Flask(__name__)
 
+# 延迟图表模式下缓存的图表数据条数（按结果ID索引，最早的先淘汰）
+CHART_CACHE_SIZE = 128
+# 小于该字节数的响应不压缩
+COMPRESS_MIN_SIZE = 1024
+
+_chart_cache = OrderedDict()
+# 开发服务器为多线程，缓存的读取、调整顺序和淘汰需要加锁
+_chart_cache_lock = threading.Lock()
+
+def _plotly_json(obj):
+    """使用PlotlyJSONEncoder序列化图表（仅在旧模式下才导入plotly）"""
+    import plotly
+    return json.dumps(obj, cls=plotly.utils.PlotlyJSONEncoder)
+
+def build_chart_series(years, cash_flows, annual_revenues, maintenance_costs, battery_replacements,
+                       demand_charge_impacts):
+    """
+    生成前端绘制现金流图所需的精简数值序列
+    - 与create_cash_flow_chart使用相同的输入，但只返回数字，由charts.js构建图表
+    - LCOS饼图直接使用metrics中的lcos_components，无需额外数据
+    """
+    return {
+        'years': list(years),
+        'cash_flows': [round(float(v), 2) for v in cash_flows],
+        'annual_revenues': [round(float(v), 2) for v in annual_revenues],
+        'maintenance_costs': [round(float(v), 2) for v in maintenance_costs],
+        'battery_replacements': [round(float(v), 2) for v in battery_replacements],
+        'demand_charge_impacts': [round(float(v or 0), 2) for v in demand_charge_impacts]
+    }
+
+def store_chart_series(series):
+    """
+    缓存图表序列并返回结果ID
+    - 结果ID由内容哈希得到，相同参数的计算结果共享同一ID，可直接用作ETag
+    """
+    body = json.dumps(series, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    result_id = hashlib.sha1(body.encode('utf-8')).hexdigest()[:16]
+    with _chart_cache_lock:
+        _chart_cache[result_id] = body
+        _chart_cache.move_to_end(result_id)
+        while len(_chart_cache) > CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+    return result_id
+
+def compressed_json_response(body, etag=None):
+    """
+    构建JSON响应
+    - body: 已序列化的JSON字符串
+    - etag: 若提供则设置弱ETag（gzip与未压缩内容共用同一校验值），并对If-None-Match返回304
+    - 客户端支持gzip且内容足够大时压缩响应
+    """
+    response = app.response_class(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if etag:
+        response.set_etag(etag, weak=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    if 'gzip' in request.accept_encodings and len(response.get_data()) >= COMPRESS_MIN_SIZE:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 def create_cash_flow_chart(years, cash_flows, annual_revenues, maintenance_costs, battery_replacements, demand_charge_impacts=None):
     """
     创建现金流瀑布图
@@ -18,6 +87,7 @@ def create_cash_flow_chart(years, cash_flows, annual_revenues, maintenance_costs
     - battery_replacements: 电池更换成本
     - demand_charge_impacts: 需量电费影响（可能是收益也可能是支出）
     """
+    import plotly.graph_objs as go
     
     # 创建收益图（正值）
     revenue_trace = go.Bar(
@@ -143,7 +213,7 @@ def create_cash_flow_chart(years, cash_flows, annual_revenues, maintenance_costs
         layout=layout
     )
     
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return _plotly_json(fig)
 
 def simulate_storage_impact(original_loads, storage_power):
     """模拟储能系统对负荷的影响
@@ -211,8 +281,22 @@ def calculate():
         second_discharge_price_type=data.get('second_discharge_price', 'peak')
     )
     
+    # 补容/更换时机优化（未启用时按循环寿命整体更换）
+    replacement_schedule = None
+    optimization_result = None
+    if data.get('enable_replacement_optimization', False):
+        optimizer = ReplacementOptimizer(
+            calculator,
+            augmentation_cost=float(data.get('augmentation_cost', 250)),
+            augmentation_step=float(data.get('augmentation_step', 10)),
+            cost_decline_rates=float(data.get('replacement_cost_decline_rate', 5))
+        )
+        optimization_result = optimizer.optimize(float(data['cycles_per_year']))
+        replacement_schedule = optimization_result['schedules'][0]
+    
     # 获取计算结果
-    cash_flows, annual_revenues, daily_revenues, maintenance_costs, operation_data = calculator.calculate_cash_flows(float(data['cycles_per_year']))
+    cash_flows, annual_revenues, daily_revenues, maintenance_costs, operation_data = calculator.calculate_cash_flows(
+        float(data['cycles_per_year']), replacement_schedule)
     
     # 获取负荷数据（如果存在）
     hourly_loads = data.get('hourly_loads', [])
@@ -287,10 +371,11 @@ def calculate():
     except:
         payback_period = None
     
-    # 计算总能量和LCOS（考虑容量衰减）
+    # 计算总能量和LCOS（按每年实际容量计算，与日收益一样以功率×时长为上限）
+    capacity_percentages = operation_data['capacity_percentages']
     total_energy = sum([
-        calculator.power * calculator.energy * float(data['cycles_per_year']) * 
-        (1 - calculator.capacity_degradation_rate) ** year * calculator.system_efficiency
+        min(calculator.power * calculator.energy, calculator.energy_capacity * capacity_percentages[year] / 100) *
+        float(data['cycles_per_year']) * calculator.system_efficiency
         for year in range(1, calculator.operation_years + 1)
     ])
     
@@ -310,53 +395,70 @@ def calculate():
     # 这里添加提取 final_capacity 的代码
     final_capacity = operation_data['final_capacity']
     
-    # 生成图表，加入需量电费影响数据
-    chart = create_cash_flow_chart(
-        years=years,
-        cash_flows=cash_flows,
-        annual_revenues=annual_revenues,
-        maintenance_costs=maintenance_costs,
-        battery_replacements=[0] * (calculator.operation_years + 1),
-        demand_charge_impacts=demand_charge_impacts
-    )
-    
     # 计算LCOS组成部分
-    lcos_data = calculator.calculate_lcos_components(float(data['cycles_per_year']), total_energy)
-    
-    # 创建LCOS饼图
-    lcos_pie = {
-        'data': [{
-            'type': 'pie',
-            'labels': list(lcos_data['components'].keys()),
-            'values': list(lcos_data['components'].values()),
-            'textinfo': 'label+percent',
-            'hovertemplate': '%{label}<br>%{value:.2f} 元/kWh<br>占比: %{percent}<extra></extra>',
-            'marker': {
-                'colors': ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728']
-            },
-            'textposition': 'outside',
-            'hole': 0.4
-        }],
-        'layout': {
-            'title': 'LCOS构成分析',
-            'height': 450,
-            'width': 500,
-            'showlegend': True,
-            'legend': {
-                'orientation': 'h',
-                'yanchor': 'bottom',
-                'y': -0.1,
-                'xanchor': 'center',
-                'x': 0.5
-            },
-            'margin': {
-                't': 50,
-                'b': 50,
-                'l': 50,
-                'r': 50
+    lcos_data = calculator.calculate_lcos_components(float(data['cycles_per_year']), total_energy, replacement_schedule)
+    
+    battery_replacements = [float(cost) for cost in operation_data['battery_replacements']]
+    
+    # 图表模式：'deferred' 只返回结果ID，由前端通过 /charts/<result_id> 获取精简序列并自行绘图；
+    # 其他值保持原有行为，在服务端生成Plotly图表
+    deferred_charts = data.get('chart_mode') == 'deferred'
+    
+    if deferred_charts:
+        chart_series = build_chart_series(
+            years=years,
+            cash_flows=cash_flows,
+            annual_revenues=annual_revenues,
+            maintenance_costs=maintenance_costs,
+            battery_replacements=battery_replacements,
+            demand_charge_impacts=demand_charge_impacts
+        )
+        result_id = store_chart_series(chart_series)
+    else:
+        # 生成图表，加入需量电费影响数据
+        chart = create_cash_flow_chart(
+            years=years,
+            cash_flows=cash_flows,
+            annual_revenues=annual_revenues,
+            maintenance_costs=maintenance_costs,
+            battery_replacements=battery_replacements,
+            demand_charge_impacts=demand_charge_impacts
+        )
+        
+        # 创建LCOS饼图
+        lcos_pie = {
+            'data': [{
+                'type': 'pie',
+                'labels': list(lcos_data['components'].keys()),
+                'values': list(lcos_data['components'].values()),
+                'textinfo': 'label+percent',
+                'hovertemplate': '%{label}<br>%{value:.2f} 元/kWh<br>占比: %{percent}<extra></extra>',
+                'marker': {
+                    'colors': ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728']
+                },
+                'textposition': 'outside',
+                'hole': 0.4
+            }],
+            'layout': {
+                'title': 'LCOS构成分析',
+                'height': 450,
+                'width': 500,
+                'showlegend': True,
+                'legend': {
+                    'orientation': 'h',
+                    'yanchor': 'bottom',
+                    'y': -0.1,
+                    'xanchor': 'center',
+                    'x': 0.5
+                },
+                'margin': {
+                    't': 50,
+                    'b': 50,
+                    'l': 50,
+                    'r': 50
+                }
             }
         }
-    }
     
     # 提取每日数据
     daily_data = operation_data.get('daily_data', {})
@@ -396,17 +498,36 @@ def calculate():
             'cycles_per_year': float(data['cycles_per_year']),
             'total_cycles': operation_data.get('total_cycles', 0),
             'current_capacity_percent': operation_data.get('current_capacity_percent', 0),
+            'replacement_schedule': replacement_schedule,
+            'max_pack_years': optimization_result['max_pack_years'] if optimization_result else None,
             'hourly_loads': hourly_loads,
             'demand_charge_rate': demand_charge_rate,
             'load_reduction': load_reduction if 'load_reduction' in locals() else 0,
             'annual_demand_impact': annual_demand_impact if 'annual_demand_impact' in locals() else 0,
             'demand_charge_impacts': demand_charge_impacts,
-        },
-        'chart': chart,
-        'lcos_pie': json.dumps(lcos_pie, cls=plotly.utils.PlotlyJSONEncoder)
+        }
     }
     
+    if deferred_charts:
+        response_data['result_id'] = result_id
+        body = json.dumps(response_data, ensure_ascii=False, separators=(',', ':'))
+        return compressed_json_response(body)
+    
+    response_data['chart'] = chart
+    response_data['lcos_pie'] = _plotly_json(lcos_pie)
+    
     return jsonify(response_data)
 
+@app.route('/charts/<result_id>', methods=['GET'])
+def charts(result_id):
+    """返回延迟图表模式下缓存的精简图表序列（支持ETag条件请求和gzip压缩）"""
+    with _chart_cache_lock:
+        body = _chart_cache.get(result_id)
+        if body is not None:
+            _chart_cache.move_to_end(result_id)
+    if body is None:
+        abort(404)
+    return compressed_json_response(body, etag=result_id)
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -109,16 +109,23 @@ class EnergyStorageCalculator:
         years_to_replacement = self.battery_cycle_life / cycles_per_year
         return int(years_to_replacement) if years_to_replacement > 0 else float('inf')
 
-    def calculate_cash_flows(self, cycles_per_year):
-        """计算现金流和详细运营数据"""
+    def calculate_cash_flows(self, cycles_per_year, replacement_schedule=None):
+        """
+        计算现金流和详细运营数据
+        - replacement_schedule: 补容/更换计划（ReplacementOptimizer.optimize 的单个情景结果），
+          为空时按循环寿命在累计循环超限当年整体更换；
+          计划中累计循环超过循环寿命（且超过一年的循环次数）而未整体更换时抛出 ValueError
+        """
         cash_flows = []
         annual_revenues = []
         daily_revenues = []
         maintenance_costs = []
+        battery_replacements = []
         capacity_percentages = []
         total_cycles = 0
         current_capacity = self.energy_capacity
         daily_data = None  # 用于存储第一年的每日数据
+        scheduled_events = {event['year']: event for event in replacement_schedule or []}
 
         for year in range(self.operation_years + 1):
             if year == 0:
@@ -127,8 +134,18 @@ class EnergyStorageCalculator:
                 annual_revenue = 0
                 daily_revenue = 0
                 maintenance_cost = 0
+                battery_replacement = 0
                 capacity_percentages.append(100)
             else:
+                # 按计划在年初补容或更换
+                if replacement_schedule is not None:
+                    event = scheduled_events.get(year)
+                    battery_replacement = event['cost'] if event else 0
+                    if event:
+                        current_capacity = self.energy_capacity * event['capacity_after'] / 100
+                        if event['action'] == 'replace':
+                            total_cycles = 0
+
                 # 计算当年收益（考虑容量衰减）
                 daily_data = self.calculate_daily_revenue(current_capacity)
                 daily_revenue = daily_data['daily_revenue']
@@ -142,24 +159,40 @@ class EnergyStorageCalculator:
                 else:
                     maintenance_cost = 0
                 
-                # 计算是否需要更换电池
                 total_cycles += cycles_per_year
-                battery_replacement = self.battery_replacement_cost if total_cycles > self.battery_cycle_life else 0
-                if battery_replacement > 0:
-                    total_cycles = 0
-                    current_capacity = self.energy_capacity
+                if replacement_schedule is not None:
+                    # 补容不重置循环次数，超过循环寿命前必须整体更换（新电池组至少可运行一年）
+                    if total_cycles > max(self.battery_cycle_life, cycles_per_year):
+                        raise ValueError(f"补容/更换计划第{year}年累计循环次数({total_cycles:.0f})超过电池循环寿命，需在此前整体更换")
+                    capacity_percentages.append((current_capacity / self.energy_capacity) * 100)
+                    current_capacity *= (1 - self.capacity_degradation_rate)
+                else:
+                    # 计算是否需要更换电池
+                    battery_replacement = self.battery_replacement_cost if total_cycles > self.battery_cycle_life else 0
+                    if battery_replacement > 0:
+                        total_cycles = 0
+                        current_capacity = self.energy_capacity
+                    
+                    capacity_percentages.append((current_capacity / self.energy_capacity) * 100)
+                    
+                    # 更新下一年的容量
+                    if battery_replacement == 0:
+                        current_capacity *= (1 - self.capacity_degradation_rate)
                 
                 cash_flow = annual_revenue - maintenance_cost - battery_replacement
-                capacity_percentages.append((current_capacity / self.energy_capacity) * 100)
-                
-                # 更新下一年的容量
-                if battery_replacement == 0:
-                    current_capacity *= (1 - self.capacity_degradation_rate)
 
             cash_flows.append(cash_flow)
             annual_revenues.append(annual_revenue)
             daily_revenues.append(daily_revenue)
             maintenance_costs.append(maintenance_cost)
+            battery_replacements.append(battery_replacement)
+
+        # 按计划运行时首次更换年份取自计划中的整体更换（补容见计划本身，无更换时为None）
+        if replacement_schedule is not None:
+            replacement_years = [y for y, event in scheduled_events.items() if event['action'] == 'replace']
+            first_replacement_year = min(replacement_years) if replacement_years else None
+        else:
+            first_replacement_year = self.calculate_first_replacement_year(cycles_per_year)
 
         # 收集详细运营数据
         operation_data = {
@@ -172,17 +205,18 @@ class EnergyStorageCalculator:
             'warranty_maintenance_cost': 0,  # 质保期内维护成本
             'first_year_after_warranty_cost': self.maintenance_cost,  # 质保期后首年维护成本
             'maintenance_growth_rate': self.maintenance_cost_growth_rate,
-            'first_replacement_year': self.calculate_first_replacement_year(cycles_per_year),
+            'first_replacement_year': first_replacement_year,
             'total_cycles': total_cycles,
             'current_capacity_percent': current_capacity / self.energy_capacity if self.energy_capacity != 0 else 0.0,  # 避免除以零
             'capacity_percentages': capacity_percentages,
             'final_capacity': current_capacity,  # 新增此行
+            'battery_replacements': battery_replacements,
         }
 
         return cash_flows, annual_revenues, daily_revenues, maintenance_costs, operation_data
 
-    def calculate_lcos_components(self, cycles_per_year, total_energy):
-        """计算LCOS的各个组成部分"""
+    def calculate_lcos_components(self, cycles_per_year, total_energy, replacement_schedule=None):
+        """计算LCOS的各个组成部分（replacement_schedule 含义同 calculate_cash_flows）"""
         years = range(1, self.operation_years + 1)
         discount_factors = [(1 + self.discount_rate) ** -i for i in years]
         
@@ -207,7 +241,11 @@ class EnergyStorageCalculator:
         # 电池更换成本
         replacement_costs = []
         total_cycles = 0
+        scheduled_costs = {event['year']: event['cost'] for event in replacement_schedule or []}
         for year in years:
+            if replacement_schedule is not None:
+                replacement_costs.append(scheduled_costs.get(year, 0))
+                continue
             total_cycles += cycles_per_year
             if total_cycles > self.battery_cycle_life:
                 replacement_costs.append(self.battery_replacement_cost)
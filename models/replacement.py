@@ -0,0 +1,182 @@
+import numpy as np
+
+# 动作编号（顺序即同值时的优先级：优先不操作，其次补容，最后整体更换）
+ACTION_KEEP = 0
+ACTION_AUGMENT = 1
+ACTION_REPLACE = 2
+ACTION_NAMES = {ACTION_AUGMENT: 'augment', ACTION_REPLACE: 'replace'}
+
+
+class ReplacementOptimizer:
+    """
+    电池补容/更换时机优化器
+
+    以(年份, 健康度SoH, 电池组已运行年数)为状态做动态规划，每年年初在三种动作中选择：
+    - 不操作（延迟更换）
+    - 补容：增加 augmentation_step 的额定容量，按 元/kWh 计价
+    - 整体更换：容量恢复到100%，费用为 battery_replacement_cost
+
+    补容与更换成本按 cost_decline_rates 逐年下降；运维成本与动作无关，不参与优化。
+    年循环次数固定，因此累计循环由电池组已运行年数决定：补容不重置循环次数，
+    累计循环将超过 battery_cycle_life 时只能整体更换。
+    计算在状态网格和多个情景上同时向量化进行，每个情景得到一套最优计划。
+    """
+
+    def __init__(self, calculator, augmentation_cost, augmentation_step,
+                 cost_decline_rates=0, revenue_multipliers=1,
+                 min_soh=None, soh_steps=201):
+        """
+        - calculator: EnergyStorageCalculator 实例
+        - augmentation_cost: 补容单价（元/kWh）
+        - augmentation_step: 每次补容的容量（%，相对额定容量）
+        - cost_decline_rates: 补容/更换成本年下降率（%），可为列表，每个元素一个情景
+        - revenue_multipliers: 收益系数，可为列表，与 cost_decline_rates 一起广播为情景
+        - min_soh: 允许运行的最低健康度（%），默认不限制
+        - soh_steps: SoH网格点数
+        """
+        self.calculator = calculator
+        self.augmentation_cost = augmentation_cost
+        self.augmentation_step = augmentation_step / 100
+        decline, multipliers = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(cost_decline_rates, dtype=float)) / 100,
+            np.atleast_1d(np.asarray(revenue_multipliers, dtype=float))
+        )
+        self.cost_decline_rates = decline.copy()
+        self.revenue_multipliers = multipliers.copy()
+        self.min_soh = min_soh / 100 if min_soh is not None else 0.0
+        self.soh_grid = np.linspace(0.0, 1.0, soh_steps)
+
+    @property
+    def scenario_count(self):
+        return len(self.cost_decline_rates)
+
+    def max_pack_years(self, cycles_per_year):
+        """
+        单个电池组在循环寿命内最多可运行的年数（不超过运营年限）
+        - 年循环次数超过循环寿命时为1年，即每年整体更换（与按循环寿命更换的规则一致）
+        """
+        calc = self.calculator
+        if cycles_per_year <= 0:
+            return calc.operation_years
+        pack_years = max(1, int(np.floor(calc.battery_cycle_life / cycles_per_year + 1e-9)))
+        return min(pack_years, calc.operation_years)
+
+    def _annual_revenue_per_kwh(self, cycles_per_year):
+        """每kWh可用容量的年收益（日收益与 min(功率×时长, 容量) 成正比）"""
+        calc = self.calculator
+        reference = calc.power * calc.energy
+        if reference <= 0:
+            return 0.0
+        return calc.calculate_daily_revenue(reference)['daily_revenue'] / reference * cycles_per_year
+
+    def _action_values(self, year, soh, wear, next_values, cycles_per_year, max_wear, cost_factors):
+        """
+        计算各动作的价值
+        - soh: 年初健康度，形状 (情景数, M)
+        - wear: 年初电池组已运行年数，可广播为 (情景数, M)
+        - next_values: 下一年各状态的价值，形状 (情景数, (max_wear + 1) × 网格点数)
+        - 返回: (动作价值, 动作后健康度, 动作成本, 下一年已运行年数)，形状均为 (情景数, 3, M)
+        """
+        calc = self.calculator
+        capacity = calc.energy_capacity
+        scenario_count = self.scenario_count
+        wear = np.broadcast_to(wear, soh.shape)
+
+        post = np.stack([
+            soh,
+            np.minimum(1.0, soh + self.augmentation_step),
+            np.ones_like(soh)
+        ], axis=1)
+        next_wear = np.stack([wear + 1, wear + 1, np.ones_like(wear)], axis=1)
+
+        cost_factor = cost_factors[:, year][:, None]
+        cost = np.stack([
+            np.zeros_like(soh),
+            self.augmentation_cost * capacity * (post[:, ACTION_AUGMENT] - soh) * cost_factor,
+            np.broadcast_to(calc.battery_replacement_cost * cost_factor, soh.shape)
+        ], axis=1)
+
+        revenue = (np.minimum(calc.power * calc.energy, post * capacity)
+                   * self._annual_revenue_per_kwh(cycles_per_year)
+                   * self.revenue_multipliers[:, None, None])
+
+        # 下一年健康度在网格上线性插值（已运行年数为整数，直接定位）
+        next_soh = post * (1 - calc.capacity_degradation_rate)
+        last = len(self.soh_grid) - 1
+        position = np.clip(next_soh, 0.0, 1.0) * last
+        lower = np.minimum(np.floor(position).astype(int), last - 1)
+        weight = position - lower
+        offset = np.minimum(next_wear, max_wear) * len(self.soh_grid)
+        flat_lower = (offset + lower).reshape(scenario_count, -1)
+        value_lower = np.take_along_axis(next_values, flat_lower, axis=1).reshape(lower.shape)
+        value_upper = np.take_along_axis(next_values, flat_lower + 1, axis=1).reshape(lower.shape)
+        continuation = value_lower * (1 - weight) + value_upper * weight
+
+        values = revenue - cost + continuation / (1 + calc.discount_rate)
+
+        # 当年运行后累计循环不能超过循环寿命；整体更换总是可行
+        feasible = (post >= self.min_soh - 1e-9) & (next_wear <= max_wear)
+        feasible[:, ACTION_REPLACE] = True
+        # 已满容量时补容没有意义
+        feasible[:, ACTION_AUGMENT] &= post[:, ACTION_AUGMENT] - soh > 1e-9
+        values = np.where(feasible, values, -np.inf)
+
+        return values, post, cost, next_wear
+
+    def optimize(self, cycles_per_year):
+        """
+        求解最优补容/更换计划
+        - 返回: 字典，包含每个情景的计划 schedules、优化目标值 values
+          （运营期收益减补容/更换成本的现值）以及单个电池组最多运行年数 max_pack_years
+          计划为事件列表，每项含 year、action('augment'/'replace')、cost、
+          capacity_before、capacity_after（容量百分比）
+        """
+        calc = self.calculator
+        years = calc.operation_years
+        scenario_count = self.scenario_count
+        max_wear = self.max_pack_years(cycles_per_year)
+        soh_count = len(self.soh_grid)
+
+        cost_factors = (1 - self.cost_decline_rates[:, None]) ** np.arange(years + 1)
+        # 所有(已运行年数, 健康度)状态展开为一维
+        state_soh = np.broadcast_to(np.tile(self.soh_grid, max_wear + 1),
+                                    (scenario_count, (max_wear + 1) * soh_count))
+        state_wear = np.repeat(np.arange(max_wear + 1), soh_count)
+
+        # 逆向递推：value_tables[year] 为该年初各状态的最优价值
+        value_tables = [None] * (years + 2)
+        value_tables[years + 1] = np.zeros(state_soh.shape)
+        for year in range(years, 0, -1):
+            values, _, _, _ = self._action_values(
+                year, state_soh, state_wear, value_tables[year + 1], cycles_per_year, max_wear, cost_factors)
+            value_tables[year] = values.max(axis=1)
+
+        # 正向模拟：从全新电池组出发，在实际健康度上重新评估各动作
+        schedules = [[] for _ in range(scenario_count)]
+        soh = np.ones((scenario_count, 1))
+        wear = np.zeros((scenario_count, 1), dtype=int)
+        scenarios = np.arange(scenario_count)
+        for year in range(1, years + 1):
+            values, post, cost, next_wear = self._action_values(
+                year, soh, wear, value_tables[year + 1], cycles_per_year, max_wear, cost_factors)
+            actions = values[:, :, 0].argmax(axis=1)
+            for k, action in enumerate(actions):
+                if action != ACTION_KEEP:
+                    schedules[k].append({
+                        'year': year,
+                        'action': ACTION_NAMES[action],
+                        'cost': float(cost[k, action, 0]),
+                        'capacity_before': float(soh[k, 0] * 100),
+                        'capacity_after': float(post[k, action, 0] * 100)
+                    })
+            soh = post[scenarios, actions] * (1 - calc.capacity_degradation_rate)
+            wear = next_wear[scenarios, actions]
+
+        # 满容量、已运行0年的状态位于展开后的第 soh_count - 1 位；折现到第0年
+        start_values = value_tables[1][:, soh_count - 1] / (1 + calc.discount_rate)
+
+        return {
+            'schedules': schedules,
+            'values': [float(v) for v in start_values],
+            'max_pack_years': max_wear
+        }
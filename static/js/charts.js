@@ -294,4 +294,132 @@ function calculateDemandCharge() {
         annualImpact: annualImpact,
         monthlyImpact: monthlyImpact
     };
-} 
\ No newline at end of file
+} 
+
+// 格式化金额（千分位，无小数）
+function formatAmount(value) {
+    return Math.round(value).toLocaleString('en-US');
+}
+
+// 根据服务端返回的精简序列构建年度现金流明细图（与app.py中create_cash_flow_chart保持一致）
+function buildCashFlowFigure(series) {
+    const years = series.years;
+    const cashFlows = series.cash_flows;
+    const annualRevenues = series.annual_revenues;
+    const maintenanceCosts = series.maintenance_costs;
+    const batteryReplacements = series.battery_replacements;
+    const demandImpacts = series.demand_charge_impacts || years.map(() => 0);
+    
+    // 初始投资（只有第0年）
+    const initialInvestment = {
+        type: 'bar',
+        name: '初始投资',
+        x: [years[0]],
+        y: [Math.min(cashFlows[0], 0)],
+        marker: { color: 'rgb(31, 119, 180)' },
+        text: [formatAmount(cashFlows[0])],
+        textposition: 'outside',
+        hovertemplate: '初始投资: ¥%{y:,.0f}<extra></extra>'
+    };
+    
+    // 削峰填谷收益（正值）
+    const revenueTrace = {
+        type: 'bar',
+        name: '削峰填谷收益',
+        x: years,
+        y: annualRevenues.map(rev => Math.max(0, rev)),
+        marker: { color: 'rgb(0, 169, 80)' },
+        text: annualRevenues.map(rev => rev > 0 ? `+${formatAmount(rev)}` : ''),
+        textposition: 'outside',
+        hovertemplate: '年份: %{x}<br>收益: ¥%{y:,.0f}<extra></extra>'
+    };
+    
+    // 运维成本（负值）
+    const maintenanceTrace = {
+        type: 'bar',
+        name: '运维成本',
+        x: years,
+        y: maintenanceCosts.map(cost => cost !== 0 ? -cost : null),
+        marker: { color: 'rgb(255, 127, 14)' },
+        text: maintenanceCosts.map(cost => cost !== 0 ? `-${formatAmount(cost)}` : ''),
+        textposition: 'outside',
+        hovertemplate: '年份: %{x}<br>运维成本: ¥%{y:,.0f}<extra></extra>'
+    };
+    
+    // 电池更换成本（负值）
+    const batteryTrace = {
+        type: 'bar',
+        name: '电池更换成本',
+        x: years,
+        y: batteryReplacements.map(cost => cost !== 0 ? -cost : null),
+        marker: { color: 'rgb(214, 39, 40)' },
+        text: batteryReplacements.map(cost => cost !== 0 ? `-${formatAmount(cost)}` : ''),
+        textposition: 'outside',
+        hovertemplate: '年份: %{x}<br>电池更换: ¥%{y:,.0f}<extra></extra>'
+    };
+    
+    const data = [initialInvestment, revenueTrace];
+    
+    // 需量电费节省（正值）
+    const positiveValues = demandImpacts.map(impact => Math.max(0, impact || 0));
+    if (positiveValues.some(v => v !== 0)) {
+        data.push({
+            type: 'bar',
+            name: '需量电费节省',
+            x: years,
+            y: positiveValues,
+            marker: { color: 'rgb(65, 105, 225)' },
+            text: demandImpacts.map(impact => impact > 0 ? `+${formatAmount(impact)}` : ''),
+            textposition: 'outside',
+            hovertemplate: '年份: %{x}<br>需量电费节省: ¥%{y:,.0f}<extra></extra>'
+        });
+    }
+    
+    data.push(maintenanceTrace);
+    
+    // 需量电费增加（负值）
+    const negativeValues = demandImpacts.map(impact => Math.min(0, impact || 0));
+    if (negativeValues.some(v => v !== 0)) {
+        data.push({
+            type: 'bar',
+            name: '需量电费增加',
+            x: years,
+            y: negativeValues,
+            marker: { color: 'rgb(148, 103, 189)' },
+            text: demandImpacts.map(impact => impact < 0 ? formatAmount(impact) : ''),
+            textposition: 'outside',
+            hovertemplate: '年份: %{x}<br>需量电费增加: ¥%{y:,.0f}<extra></extra>'
+        });
+    }
+    
+    data.push(batteryTrace);
+    
+    const layout = {
+        title: '年度现金流明细',
+        barmode: 'relative',  // 使用相对模式，让正负值分别显示在x轴上下
+        xaxis: {
+            title: '年份',
+            tickmode: 'array',
+            ticktext: years.map(year => `第${year}年`),
+            tickvals: years
+        },
+        yaxis: {
+            title: '金额 (元)',
+            zeroline: true,
+            zerolinewidth: 2,
+            zerolinecolor: 'black'
+        },
+        showlegend: true,
+        legend: {
+            orientation: 'h',
+            yanchor: 'bottom',
+            y: 1.02,
+            xanchor: 'right',
+            x: 1
+        },
+        margin: { t: 50, b: 50, l: 50, r: 50 },
+        hovermode: 'x unified'
+    };
+    
+    return { data: data, layout: layout };
+}
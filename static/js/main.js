@@ -57,6 +57,9 @@ $(document).ready(function() {
             updateModifiedLoadChart();
             // 确保在切换到负荷优化标签页时计算需量电费
             calculateDemandCharge();
+        } else if (tabId === 'financial-analysis-tab') {
+            // 现金流图在首次查看时才获取
+            loadCashFlowChart();
         }
     });
     
@@ -209,7 +212,13 @@ function calculate() {
         hourly_loads: getHourlyLoads(),
         load_reduction: loadReduction,
         enable_demand_charge: enableDemandCharge, // 添加此参数传递给后端
+        enable_replacement_optimization: $('#enable_replacement_optimization').is(':checked'),
+        augmentation_cost: $('#augmentation_cost').val(),
+        augmentation_step: $('#augmentation_step').val(),
+        replacement_cost_decline_rate: $('#replacement_cost_decline_rate').val(),
+        chart_mode: 'deferred', // 服务端只返回结果ID，图表数据按需获取
     };
+    lastCalculationData = data;
     
     $.ajax({
         url: '/calculate',
@@ -243,6 +252,75 @@ function calculate() {
     });
 }
 
+// 延迟图表模式下当前结果的ID、已绘制到页面上的结果ID，以及最近一次计算的请求参数
+let cashFlowChartResultId = null;
+let renderedCashFlowChartId = null;
+let lastCalculationData = null;
+
+// 获取并绘制现金流图（浏览器会携带ETag进行条件请求，未变化时服务端返回304）
+function loadCashFlowChart() {
+    const resultId = cashFlowChartResultId;
+    if (!resultId || resultId === renderedCashFlowChartId) {
+        return;
+    }
+    
+    $.ajax({
+        url: '/charts/' + resultId,
+        type: 'GET',
+        dataType: 'json',
+        success: function(series) {
+            // 期间如果已有新的计算结果，丢弃过期数据
+            if (resultId !== cashFlowChartResultId) {
+                return;
+            }
+            const figure = buildCashFlowFigure(series);
+            Plotly.newPlot('chart', figure.data, figure.layout);
+            renderedCashFlowChartId = resultId;
+        },
+        error: function(xhr, status, error) {
+            console.error('获取现金流图表数据失败:', error);
+            if (resultId !== cashFlowChartResultId) {
+                return;
+            }
+            // 缓存已失效（服务重启、多进程或被淘汰）时，改用服务端生成图表的模式重新计算
+            if (xhr.status === 404 && lastCalculationData) {
+                loadServerCashFlowChart(resultId);
+            } else {
+                showCashFlowChartError();
+            }
+        }
+    });
+}
+
+// 以服务端生成图表的模式重新请求计算，仅用于绘制现金流图
+function loadServerCashFlowChart(resultId) {
+    $.ajax({
+        url: '/calculate',
+        type: 'POST',
+        contentType: 'application/json',
+        data: JSON.stringify($.extend({}, lastCalculationData, { chart_mode: 'server' })),
+        success: function(response) {
+            if (resultId !== cashFlowChartResultId) {
+                return;
+            }
+            Plotly.newPlot('chart', JSON.parse(response.chart));
+            renderedCashFlowChartId = resultId;
+        },
+        error: function(xhr, status, error) {
+            console.error('重新生成现金流图表失败:', error);
+            if (resultId === cashFlowChartResultId) {
+                showCashFlowChartError();
+            }
+        }
+    });
+}
+
+// 现金流图无法获取时显示提示，避免残留上一次的图表
+function showCashFlowChartError() {
+    Plotly.purge('chart');
+    $('#chart').html('<p style="padding: 20px; color: #dc3545;">现金流图表加载失败，请重新计算</p>');
+}
+
 // 更新计算结果后的回调函数
 function updateResultsDisplay(response) {
     // 更新基本指标
@@ -255,9 +333,19 @@ function updateResultsDisplay(response) {
     // 更新其他计算值
     updateCalculatedValues(response);
     
-    // 渲染图表
+    // 渲染图表：旧模式直接使用服务端生成的图表，延迟模式记录结果ID，待查看财务分析时再获取
     if (response.chart) {
+        cashFlowChartResultId = null;
         Plotly.newPlot('chart', JSON.parse(response.chart));
+    } else if (response.result_id) {
+        // 清除上一次的图表，新图表在查看财务分析时获取
+        Plotly.purge('chart');
+        $('#chart').empty();
+        cashFlowChartResultId = response.result_id;
+        renderedCashFlowChartId = null;
+        if ($('#financial-analysis-tab').hasClass('active')) {
+            loadCashFlowChart();
+        }
     }
     
     // 更新LCOS组成部分的具体数值和占比
@@ -376,6 +464,20 @@ function updateCalculatedValues(response) {
     $('#cycles_per_year_result').text(response.metrics.cycles_per_year || '-');
     $('#total_cycles').text(response.metrics.total_cycles || '-');
     $('#current_capacity_percent').text((((response.metrics.current_capacity_percent || 0) * 100).toFixed(2)));
+    
+    // 补容/更换计划（仅在启用优化时返回）
+    $('#max_pack_years').text(response.metrics.max_pack_years || '-');
+    const schedule = response.metrics.replacement_schedule;
+    if (!schedule) {
+        $('#replacement_schedule').text('-');
+    } else if (schedule.length === 0) {
+        $('#replacement_schedule').text('无需补容或更换');
+    } else {
+        $('#replacement_schedule').text(schedule.map(event =>
+            `第${event.year}年${event.action === 'replace' ? '整体更换' : '补容'}` +
+            `(${event.capacity_before.toFixed(1)}%→${event.capacity_after.toFixed(1)}%, ${(event.cost / 10000).toFixed(2)}万元)`
+        ).join('；'));
+    }
 }
 
 // 显示欢迎消息
@@ -0,0 +1,117 @@
+import gzip
+import json
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    app_module._chart_cache.clear()
+    return app_module.app.test_client()
+
+
+def calculate(client, **overrides):
+    payload = {'cycles_per_year': 330, 'chart_mode': 'deferred'}
+    payload.update(overrides)
+    response = client.post('/calculate', json=payload)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_deferred_calculate_returns_result_id_only(client):
+    data = calculate(client)
+
+    assert data['result_id'] in app_module._chart_cache
+    assert 'chart' not in data
+    assert 'lcos_pie' not in data
+
+
+def test_charts_sets_weak_etag_and_vary(client):
+    result_id = calculate(client)['result_id']
+    response = client.get(f'/charts/{result_id}')
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'W/"{result_id}"'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.get_json()['years'] == list(range(16))
+
+
+def test_charts_if_none_match_returns_304(client):
+    result_id = calculate(client)['result_id']
+    etag = client.get(f'/charts/{result_id}').headers['ETag']
+    response = client.get(f'/charts/{result_id}', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_charts_unknown_id_returns_404(client):
+    assert client.get('/charts/0000000000000000').status_code == 404
+
+
+def test_charts_gzip_only_for_large_body_when_accepted(client):
+    # 默认15年的序列小于压缩阈值
+    small_id = calculate(client)['result_id']
+    small = client.get(f'/charts/{small_id}', headers={'Accept-Encoding': 'gzip'})
+    assert len(small.data) < app_module.COMPRESS_MIN_SIZE
+    assert 'Content-Encoding' not in small.headers
+
+    large_id = calculate(client, operation_years=100)['result_id']
+    body = app_module._chart_cache[large_id].encode('utf-8')
+    assert len(body) >= app_module.COMPRESS_MIN_SIZE
+
+    plain = client.get(f'/charts/{large_id}')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.data == body
+
+    compressed = client.get(f'/charts/{large_id}', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(compressed.data)) == json.loads(body)
+
+
+def test_chart_cache_evicts_oldest(client):
+    ids = [app_module.store_chart_series({'years': [i]}) for i in range(app_module.CHART_CACHE_SIZE + 1)]
+
+    assert len(app_module._chart_cache) == app_module.CHART_CACHE_SIZE
+    assert ids[0] not in app_module._chart_cache
+    assert ids[-1] in app_module._chart_cache
+    assert client.get(f'/charts/{ids[0]}').status_code == 404
+
+
+def test_optimization_with_cycles_above_cycle_life(client):
+    data = calculate(client, battery_cycle_life=200, enable_replacement_optimization=True)
+
+    schedule = data['metrics']['replacement_schedule']
+    assert [event['year'] for event in schedule if event['action'] == 'replace'] == list(range(2, 16))
+    assert data['metrics']['max_pack_years'] == 1
+
+
+def test_empty_schedule_keeps_lcos(client):
+    params = dict(augmentation_cost=1e9, battery_replacement_cost=1e9)
+    baseline = calculate(client, **params)['metrics']
+    optimized = calculate(client, enable_replacement_optimization=True, **params)['metrics']
+
+    assert optimized['replacement_schedule'] == []
+    assert optimized['cash_flows'] == baseline['cash_flows']
+    assert optimized['total_energy'] == pytest.approx(baseline['total_energy'])
+    assert optimized['lcos'] == pytest.approx(baseline['lcos'])
+
+
+def test_optimized_schedule_feeds_chart_and_lcos(client):
+    data = calculate(client, battery_cycle_life=3000, enable_replacement_optimization=True)
+    metrics = data['metrics']
+    schedule = metrics['replacement_schedule']
+    assert any(event['action'] == 'replace' for event in schedule)
+
+    series = client.get(f"/charts/{data['result_id']}").get_json()
+    expected = [0.0] * 16
+    for event in schedule:
+        expected[event['year']] = round(event['cost'], 2)
+    assert series['battery_replacements'] == expected
+
+    discount_rate = 0.08
+    pv_replacement = sum(event['cost'] / (1 + discount_rate) ** event['year'] for event in schedule)
+    assert metrics['lcos_present_values']['replacement'] == pytest.approx(pv_replacement)
+    assert metrics['lcos_components']['更换成本'] == pytest.approx(pv_replacement / metrics['total_energy'])
@@ -0,0 +1,78 @@
+import pytest
+
+from models.calculator import EnergyStorageCalculator
+from models.replacement import ReplacementOptimizer
+
+
+def make_calculator(**overrides):
+    params = dict(
+        capex=520000, power=250, energy=2, energy_capacity=522,
+        price_peak=1.0, price_sharp_peak=1.2, price_flat=0.6, price_valley=0.4, price_deep_valley=0.2,
+        operation_years=15, discount_rate=0.08, opex_percent=0.02, charge_discharge_mode='single',
+        capacity_degradation_rate=2, warranty_period=5, maintenance_cost=10000,
+        battery_cycle_life=6000, battery_replacement_cost=100000,
+        charging_efficiency=95, discharging_efficiency=95, maintenance_cost_growth_rate=5
+    )
+    params.update(overrides)
+    return EnergyStorageCalculator(**params)
+
+
+def replacement_years(schedule):
+    return [event['year'] for event in schedule if event['action'] == 'replace']
+
+
+@pytest.mark.parametrize('cycle_life, operation_years', [(3000, 15), (1200, 6)])
+def test_short_cycle_life_forces_replacement(cycle_life, operation_years):
+    calculator = make_calculator(battery_cycle_life=cycle_life, operation_years=operation_years)
+    schedule = ReplacementOptimizer(calculator, 250, 10).optimize(330)['schedules'][0]
+
+    assert replacement_years(schedule)
+    # 按计划运行时累计循环不超过循环寿命（超过会抛出 ValueError）
+    calculator.calculate_cash_flows(330, schedule)
+
+
+def test_cycle_life_changes_schedule():
+    schedules = [
+        ReplacementOptimizer(make_calculator(battery_cycle_life=cycle_life), 250, 10).optimize(330)['schedules'][0]
+        for cycle_life in (6000, 3000)
+    ]
+    assert not replacement_years(schedules[0])
+    assert schedules[0] != schedules[1]
+
+
+def test_optimized_value_matches_cash_flow_npv():
+    calculator = make_calculator(battery_cycle_life=3000)
+    result = ReplacementOptimizer(calculator, 250, 10, cost_decline_rates=[0, 5]).optimize(300)
+
+    for schedule, value in zip(result['schedules'], result['values']):
+        cash_flows, _, _, maintenance_costs, _ = calculator.calculate_cash_flows(300, schedule)
+        npv = sum(cf / 1.08 ** year for year, cf in enumerate(cash_flows))
+        pv_maintenance = sum(cost / 1.08 ** year for year, cost in enumerate(maintenance_costs))
+        assert npv == pytest.approx(-calculator.capex + value - pv_maintenance, rel=1e-9)
+
+
+def test_schedule_past_cycle_life_is_rejected():
+    calculator = make_calculator(battery_cycle_life=3000)
+    schedule = [{'year': 4, 'action': 'augment', 'cost': 5000, 'capacity_before': 94, 'capacity_after': 100}]
+
+    with pytest.raises(ValueError):
+        calculator.calculate_cash_flows(330, schedule)
+
+
+def test_first_replacement_year_ignores_augmentation():
+    calculator = make_calculator(battery_cycle_life=3000)
+    schedule = [
+        {'year': 4, 'action': 'augment', 'cost': 5000, 'capacity_before': 94, 'capacity_after': 100},
+        {'year': 9, 'action': 'replace', 'cost': 100000, 'capacity_before': 90, 'capacity_after': 100}
+    ]
+
+    _, _, _, _, operation_data = calculator.calculate_cash_flows(330, schedule)
+    assert operation_data['first_replacement_year'] == 9
+
+
+def test_cycles_above_cycle_life_replace_every_year():
+    calculator = make_calculator(battery_cycle_life=200)
+    schedule = ReplacementOptimizer(calculator, 250, 10).optimize(330)['schedules'][0]
+
+    assert replacement_years(schedule) == list(range(2, 16))
+    calculator.calculate_cash_flows(330, schedule)